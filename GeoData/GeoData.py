@@ -11,15 +11,19 @@ from six import integer_types,string_types
 #import time
 
 import posixpath
-from copy import deepcopy
+import threading
 from datetime import datetime
 import numpy as np
 import scipy as sp
 import scipy.interpolate as spinterp
-from  scipy.spatial import Delaunay
+from  scipy.spatial import Delaunay,cKDTree
 import tables
 from pandas import DataFrame
 import pdb
+try:
+    import numexpr as ne
+except ImportError:
+    ne = None
 from warnings import warn
 #
 from . import CoordTransforms as CT
@@ -52,6 +56,8 @@ class GeoData(object):
         assert isinstance(self.sensorloc,numerics),"sensorloc needs to be a numpy array"
         assert isinstance(self.times,numerics),"times needs to be a numpy array"
         self.times = timerepair(self.times)
+        # Transformed coordinates from __changecoords__ keyed by the lower case coordinate name.
+        self.coordcache = {}
 
         # Make sure the times vector is sorted
         if not self.issatellite():
@@ -59,7 +65,14 @@ class GeoData(object):
             sortvec = sp.argsort(timestemp)
             self.times=self.times[sortvec]
             for ikey in self.datanames():
-                self.data[ikey]=self.data[ikey][:,sortvec]
+                curdata = self.data[ikey]
+                if isinstance(curdata,np.ndarray) and curdata.ndim==2 and curdata.shape[1]<curdata.shape[0]:
+                    # Data is mostly accessed one time at a time so keep NlocxNt arrays column-major.
+                    self.data[ikey] = np.empty(curdata.shape,dtype=curdata.dtype,order='F')
+                    # mode='clip' lets take write straight into out, sortvec is always in bounds
+                    np.take(curdata,sortvec,axis=1,out=self.data[ikey],mode='clip')
+                else:
+                    self.data[ikey]=curdata[:,sortvec]
 
     def datanames(self):
         '''Returns the data names in a list.'''
@@ -69,24 +82,23 @@ class GeoData(object):
         '''Writes out the structured h5 files for the class.
         inputs
         filename - The filename of the output.'''
+        filters = tables.Filters(complevel=5, complib='blosc', shuffle=True)
         with tables.openFile(filename, mode = "w", title = "GeoData Out") as h5file:
-            # get the names of all the variables set in the init function
-            varnames = self.__dict__.keys()
-            vardict = self.__dict__
             try:
                 # XXX only allow 1 level of dictionaries, do not allow for dictionary of dictionaries.
                 # Make group for each dictionary
-                for cvar in varnames:
-                    #group = h5file.create_group(posixpath.sep, cvar,cvar +'dictionary')
-                    if isinstance(vardict[cvar],dict): # Check if dictionary
-                        dictkeys = vardict[cvar].keys()
+                for cvar in VARNAMES:
+                    curvar = getattr(self,cvar)
+                    if isinstance(curvar,dict): # Check if dictionary
                         group2 = h5file.create_group('/',cvar,cvar+' dictionary')
-                        for ikeys in dictkeys:
-                            h5file.create_array(group2,ikeys,vardict[cvar][ikeys])#,'Static array')
+                        for ikeys,ivals in curvar.items():
+                            # time is along the first axis for satellite data and 3-D data
+                            timeax = 0 if self.issatellite() or np.ndim(ivals)!=2 else 1
+                            h5_array(h5file,group2,ikeys,ivals,filters,timeax)#,'Static array')
                     else:
-                        if isinstance(vardict[cvar],string_types):
-                            vardict[cvar] = np.string_(vardict[cvar]) #HDF5 wants fixed length strings
-                        h5file.create_array(h5file.root, cvar, vardict[cvar])#,'Static array')
+                        if isinstance(curvar,string_types):
+                            curvar = np.string_(curvar) #HDF5 wants fixed length strings
+                        h5_array(h5file,h5file.root,cvar,curvar,filters)#,'Static array')
             except Exception as e: # catch *all* exceptions
                 raise ValueError('problem writing {} due to {}'.format(filename,e))
 
@@ -103,17 +115,26 @@ class GeoData(object):
         of the first object."""
         times1 = timerepair(self.times)
         times2 = timerepair(self2.times)
-        outcell = [sp.array([])]*times1.shape[0]
-        for k in  range(times1.shape[0]):
-            l = times1[k,:]
-
-            list1 = sp.argwhere(l[0]>times2[:,0])
-            list2 = sp.argwhere(l[1]<times2[:,1])
-            if (list1.size==0) or (list2.size==0):
-               continue
-            ind1 = list1[-1][0]
-            ind2 = list2[0][0]
-            outcell[k]=sp.arange(ind1,ind2+1).astype('int64')
+        if not (times2[1:]>=times2[:-1]).all():
+            # Unsorted times, e.g. satellite data, have to be searched in full.
+            outcell = [np.array([])]*times1.shape[0]
+            for k in  range(times1.shape[0]):
+                l = times1[k,:]
+
+                list1 = np.argwhere(l[0]>times2[:,0])
+                list2 = np.argwhere(l[1]<times2[:,1])
+                if (list1.size==0) or (list2.size==0):
+                   continue
+                ind1 = list1[-1][0]
+                ind2 = list2[0][0]
+                outcell[k]=np.arange(ind1,ind2+1).astype('int64')
+            return outcell
+        # Last start time before each start and first end time after each end.
+        ind1 = np.searchsorted(times2[:,0],times1[:,0],side='left')-1
+        ind2 = np.searchsorted(times2[:,1],times1[:,1],side='right')
+        valid = (ind1>=0) & (ind2<times2.shape[0])
+        outcell = [np.arange(i1,i2+1).astype('int64') if v else np.array([])
+                   for i1,i2,v in zip(ind1,ind2,valid)]
         return outcell
 
     def time2ind(self,timelist):
@@ -125,39 +146,65 @@ class GeoData(object):
                 outlist - The list of indexies that correspond to the locations
                     in the array.
         """
-        ix = np.in1d(self.times[:,0],timelist)
-        return np.where(ix)[0]
+        starttimes = self.times[:,0]
+        timelist = np.atleast_1d(timelist)
+        if not (starttimes[1:]>=starttimes[:-1]).all():
+            ix = np.isin(starttimes,timelist)
+            return np.where(ix)[0]
+        # The times are sorted so a binary search avoids sorting the whole time array.
+        # Start times can repeat so take every row between the left and right matches.
+        querytimes = np.unique(timelist)
+        lo = np.searchsorted(starttimes,querytimes,side='left')
+        hi = np.searchsorted(starttimes,querytimes,side='right')
+        counts = hi-lo
+        if (counts<=1).all():
+            # unique start times, which is the usual case
+            return lo[counts==1]
+        # Expand each lo:hi range, shifting a running count by where each range starts.
+        starts = np.cumsum(counts)-counts
+        return np.repeat(lo-starts,counts)+np.arange(counts.sum())
     #%% Time augmentation
     def add_times(self,self2):
         """This method will combine the times and content of two instances of the GeoData class.
         The first object will be extendent in time."""
-        datakeys = self.data.keys()
-        assert set(datakeys) ==set(self2.data.keys()),'Data must have the same names.'
+        assert samekeys(self.data,self2.data),'Data must have the same names.'
         # Look at the coordinate names
         assert self.coordnames==self2.coordnames,'Must be same coordinate same.'
         # Look at the data location
-        a = np.ma.array(self.dataloc,mask=np.isnan(self.dataloc))
-        blah = np.ma.array(self2.dataloc,mask=np.isnan(self2.dataloc))
-        assert np.ma.allequal(a,blah),'Location points must be the same'
+        assert nan_equal(self.dataloc,self2.dataloc),'Location points must be the same'
 
         # Look at the sensor location
-        a = np.ma.array(self.sensorloc,mask=np.isnan(self.sensorloc))
-        blah = np.ma.array(self2.sensorloc,mask=np.isnan(self2.sensorloc))
-        assert np.ma.allequal(a,blah),'Sensor Locations must be the same'
+        assert nan_equal(self.sensorloc,self2.sensorloc),'Sensor Locations must be the same'
 
-        alltimes = sp.vstack((timerepair(self.times),timerepair(self2.times)))
+        times1 = timerepair(self.times)
+        times2 = timerepair(self2.times)
+        (N1,N2) = (times1.shape[0],times2.shape[0])
 
-        #sort based off of start times
-        s_ind = sp.argsort(alltimes[:,0])
-        self.times = alltimes[s_ind]
-        
-        if self.issatellite():
-            for ikey in self.datanames():
-                outarr=sp.concatenate((self.data[ikey],self2.data[ikey]),0)
-                self.data[ikey]=outarr[s_ind]
-            for ikey in self.datanames():
-                outarr = sp.hstack((self.data[ikey],self2.data[ikey]))
-                self.data[ikey] = outarr[:,s_ind]
+        # Find where each time goes in the combined array, sorted by start times.
+        if (np.diff(times1[:,0])>=0).all() and (np.diff(times2[:,0])>=0).all():
+            # Both are already sorted so they only need to be merged.
+            ind1 = np.searchsorted(times2[:,0],times1[:,0],side='left')+np.arange(N1)
+            ind2 = np.searchsorted(times1[:,0],times2[:,0],side='right')+np.arange(N2)
+        else:
+            s_ind = np.argsort(np.concatenate((times1[:,0],times2[:,0])),kind='mergesort')
+            allind = np.empty(N1+N2,dtype='int64')
+            allind[s_ind] = np.arange(N1+N2)
+            (ind1,ind2) = (allind[:N1],allind[N1:])
+
+        self.times = np.empty((N1+N2,2),dtype=np.result_type(times1,times2))
+        self.times[ind1] = times1
+        self.times[ind2] = times2
+
+        for ikey in self.datanames():
+            (arr1,arr2) = (self.data[ikey],self2.data[ikey])
+            # time is along the first axis for satellite data and 3-D data
+            axis = 0 if self.issatellite() or arr1.ndim==3 else 1
+            outshape = list(arr1.shape)
+            outshape[axis] = N1+N2
+            outarr = np.empty(outshape,dtype=np.result_type(arr1,arr2))
+            outarr[(slice(None),)*axis+(ind1,)] = arr1
+            outarr[(slice(None),)*axis+(ind2,)] = arr2
+            self.data[ikey] = outarr
 
     def timeslice(self,timelist,listtype=None):
         """ This method will return a copy of the object with only the desired points of time.
@@ -175,8 +222,7 @@ class GeoData(object):
         elif listtype =='Array':
             loclist = timelist
         elif listtype == 'Time':
-            ix = np.in1d(self.times[:,0],timelist)
-            loclist = np.where(ix)[0]
+            loclist = self.time2ind(timelist)
 
         gd2 = self.copy()
         if gd2.issatellite():
@@ -184,7 +230,7 @@ class GeoData(object):
             gd2.dataloc = gd2.dataloc[loclist]
             for idata in gd2.datanames():
                 if isinstance(gd2.data[idata],DataFrame):
-                    gd2.data[idata] = gd2.data[idata][gd2.times] #data is a vector
+                    gd2.data[idata] = gd2.data[idata].iloc[loclist] #data is a vector
                 else:
                     gd2.data[idata] = gd2.data[idata][loclist]
 
@@ -199,7 +245,7 @@ class GeoData(object):
 
             for idata in gd2.datanames():
                 if isinstance(gd2.data[idata],DataFrame):
-                    gd2.data[idata] = gd2.data[idata][gd2.times] #data is a vector
+                    gd2.data[idata] = gd2.data[idata].iloc[:,loclist] #columns are time
                 elif gd2.data[idata].ndim==2:
                     gd2.data[idata] = gd2.data[idata][:,loclist]
                 elif gd2.data[idata].ndim==3:
@@ -218,6 +264,7 @@ class GeoData(object):
         if self.issatellite():
             self.times=self.times[keep]
             self.dataloc=self.dataloc[keep]
+            self.coordcache.clear()
             for idata in self.datanames():
                 if isinstance(self.data[idata],DataFrame):
                     self.data[idata] = self.data[idata][self.times] #data is a vector
@@ -249,9 +296,9 @@ class GeoData(object):
         Checks if the instance is satellite data.
            It will give true if the sensorloc array is all nans
         """
-        return sp.isnan(self.sensorloc).all() or self.sensorloc is None
+        return self.sensorloc is None or np.isnan(self.sensorloc).all()
 #%% Changing data based on location
-    def interpolate(self,new_coords,newcoordname,method='nearest',fill_value=np.nan,twodinterp = False,ikey=None,oldcoords=None):
+    def interpolate(self,new_coords,newcoordname,method='nearest',fill_value=np.nan,twodinterp = False,ikey=None,oldcoords=None,cachewts=True):
         """This method will take the data points in the dictionary data and spatially.
         interpolate the points given the new coordinates. The method of interpolation
         will be determined by the input parameter method.
@@ -262,6 +309,10 @@ class GeoData(object):
             method - A string. The method of interpolation curently only accepts 'linear',
             'nearest' and 'cubic'
             fill_value - The fill value for the interpolation.
+            cachewts - (default - True) For linear interpolation keep the points and
+            weights in a module level cache so later calls onto the same grid skip
+            the triangulation. The cache holds copies of both sets of points and
+            lasts until it's replaced or clear_interp_cache() is called.
         """
         curavalmethods = ('linear', 'nearest', 'cubic')
         interpmethods = ('linear', 'nearest', 'cubic')
@@ -271,7 +322,7 @@ class GeoData(object):
         Nt = self.times.shape[0]
         NNlocs = new_coords.shape[0]
 #        print NNlocs
-        new_coordsorig = deepcopy(new_coords)
+        new_coordsorig = np.array(new_coords,copy=True)
         if oldcoords is None:
             curcoords = self.__changecoords__(newcoordname)
         else:
@@ -296,6 +347,9 @@ class GeoData(object):
             NNlocs = new_coords.shape[0]
         if method.lower()=='linear':
             firsttime=True
+        # Points with valid coordinates and the points the last grid interpolator was built on.
+        coordfinite = ~np.isnan(curcoords).any(axis=1)
+        lastkeep = None
 
         # Check to see if you're outputing all of the parameters
         if ikey is None or ikey not in self.data.keys():
@@ -304,7 +358,41 @@ class GeoData(object):
                 print("Interpolating {}".format(iparam))
                 usepandas=True if isinstance(self.data[iparam],DataFrame) else False
                 # won't it virtually always be float?
-                New_param = np.empty((NNlocs,Nt))#,dtype=self.data[iparam].dtype)
+                New_param = np.empty((NNlocs,Nt),order='F')#,dtype=self.data[iparam].dtype)
+                # If the same points are used at every time, interpolate all of the times at once.
+                if (not usepandas and self.data[iparam].ndim in (2,3) and
+                        (method.lower()=='linear' or iparam=='optical' or np.isfinite(self.data[iparam]).all())):
+                    if self.data[iparam].ndim==2:
+                        allparam = self.data[iparam]
+                    else:
+                        allparam = self.data[iparam].reshape(Nt,-1).T
+                    keeplog = coordfinite
+                    if not keeplog.any():
+                        New_param[:] = np.nan
+                    elif method.lower()=='linear':
+                        if firsttime:
+                            vtx, wts =cached_interp_weights(curcoords[keeplog], new_coords,d,cachewts)
+                            firsttime=False
+                        New_param[:] = interpolate(allparam[keeplog], vtx, wts,fill_value)
+                    else:
+                        if lastkeep is None or not np.array_equal(keeplog,lastkeep):
+                            gridinterp = grid_interpolator(curcoords[keeplog],new_coords,method,fill_value)
+                            lastkeep = keeplog
+                        New_param[:] = gridinterp(allparam[keeplog])
+                    self.data[iparam] = New_param
+                    continue
+
+                finite = None
+                constkeep = None
+                if (iparam != 'optical') and (method.lower()!='linear'):
+                    # Find the finite points for every time in one pass.
+                    finite = np.isfinite(np.asarray(self.data[iparam]))
+                    if finite.ndim==3:
+                        finite = finite.reshape(Nt,-1).T
+                    finite &= coordfinite[:,np.newaxis]
+                    # The nans usually come from the beam pattern so they are often the same at every time.
+                    if (finite==finite[:,:1]).all():
+                        constkeep = finite[:,0]
                 for itime,tim in enumerate(self.times):
                     print("\tInterpolating time instance {} of {} for parameter {}".format(itime,len(self.times),iparam))
                     if usepandas:
@@ -316,32 +404,27 @@ class GeoData(object):
                             curparam = self.data[iparam][itime,:,:].ravel()
                         else:
                             raise ValueError('incorrect data matrix shape')
+                    curparam = np.asarray(curparam)
 
-                    if (iparam != 'optical') and (method.lower()!='linear'):
-                        dfmask = np.isfinite(curparam)
-                        curparam = curparam[dfmask]
-                        npmask=dfmask.values if usepandas else dfmask #have to do this for proper indexing of numpy arrays!
-                        coordkeep = curcoords[npmask,:]
+                    if finite is None:
+                        keeplog = coordfinite
+                    elif constkeep is not None:
+                        keeplog = constkeep
                     else:
-                        coordkeep = curcoords
-
-                    if coordkeep.shape[0]>0: # at least one finite value
+                        keeplog = finite[:,itime]
 
+                    if keeplog.any(): # at least one finite value
                         if method.lower()=='linear':
                             if firsttime:
-                                nanlog = sp.any(sp.isnan(coordkeep),1)
-                                keeplog = ~nanlog
-                                coordkeep = coordkeep[keeplog]
-
-                                vtx, wts =interp_weights(coordkeep, new_coords,d)
+                                vtx, wts =cached_interp_weights(curcoords[keeplog], new_coords,d,cachewts)
                                 firsttime=False
                             intparam = interpolate(curparam[keeplog], vtx, wts,fill_value)
                         else:
-                            nanlog = sp.isnan(coordkeep).any(axis=1)
-                            assert isinstance(nanlog,np.ndarray),'you must have more than one value to griddata interp, try method=linear'
-                            keeplog = ~nanlog
-                            coordkeep = coordkeep[keeplog,:]
-                            intparam = spinterp.griddata(coordkeep,curparam[keeplog],new_coords,method,fill_value)
+                            # Only rebuild the triangulation/tree when the set of points changes.
+                            if lastkeep is None or not (keeplog is lastkeep or np.array_equal(keeplog,lastkeep)):
+                                gridinterp = grid_interpolator(curcoords[keeplog],new_coords,method,fill_value)
+                                lastkeep = keeplog
+                            intparam = gridinterp(curparam[keeplog])
                     else: # no finite values
                         intparam = np.nan
                     New_param[:,itime] = intparam
@@ -350,15 +433,17 @@ class GeoData(object):
 
             self.dataloc = new_coordsorig
             self.coordnames=newcoordname
+            self.coordcache.clear()
         else:
-            New_param = np.zeros((NNlocs,Nt),dtype=self.data[ikey].dtype)
+            New_param = np.zeros((NNlocs,Nt),dtype=self.data[ikey].dtype,order='F')
+            # Find the points that are not nans for every time in one pass.
+            datakeep = ~np.isnan(self.data[ikey])
             for itime in range(Nt):
-                curparam =self.data[ikey][:,itime]
-                datakeep = ~np.isnan(curparam)
-                curparam = curparam[datakeep]
-                coordkeep = curcoords[datakeep]
-                intparam = spinterp.griddata(coordkeep,curparam,new_coords,method,fill_value)
-                New_param[:,itime] = intparam
+                keeplog = datakeep[:,itime]
+                if lastkeep is None or not np.array_equal(keeplog,lastkeep):
+                    gridinterp = grid_interpolator(curcoords[keeplog],new_coords,method,fill_value)
+                    lastkeep = keeplog
+                New_param[:,itime] = gridinterp(self.data[ikey][keeplog,itime])
             return New_param
 
     def __changecoords__(self,newcoordname):
@@ -369,19 +454,27 @@ class GeoData(object):
         outputs
         outcoords: A new coordinate system where each row is a coordinate in the new system.
         """
-        if self.coordnames.lower()=='spherical' and newcoordname.lower()=='cartesian':
-            return CT.sphereical2Cartisian(self.dataloc)
-        if self.coordnames.lower()== 'cartesian'and newcoordname.lower()=='spherical':
-            return CT.cartisian2Sphereical(self.dataloc)
         if self.coordnames==newcoordname:
             return self.dataloc
-        if self.coordnames.lower()=='spherical' and newcoordname.lower()=='wgs84':
+        # The cache is only valid if the locations have not been replaced since.
+        cached = self.coordcache.get(newcoordname.lower())
+        if cached is not None and cached[0] is self.dataloc and cached[1] is self.sensorloc and cached[2]==self.coordnames:
+            return cached[3]
+
+        if self.coordnames.lower()=='spherical' and newcoordname.lower()=='cartesian':
+            outcoords = CT.sphereical2Cartisian(self.dataloc)
+        elif self.coordnames.lower()== 'cartesian'and newcoordname.lower()=='spherical':
+            outcoords = CT.cartisian2Sphereical(self.dataloc)
+        elif self.coordnames.lower()=='spherical' and newcoordname.lower()=='wgs84':
             cart1 = CT.sphereical2Cartisian(self.dataloc)
             enu = CT.cartisian2enu(cart1)
             sloc = np.tile(self.sensorloc[np.newaxis,:],(len(enu),1))
             ECEF = CT.enu2ecefl(enu,sloc)
-            return CT.ecef2wgs(ECEF).transpose()
-        raise ValueError('Wrong inputs for coordnate names was given.')
+            outcoords = CT.ecef2wgs(ECEF).transpose()
+        else:
+            raise ValueError('Wrong inputs for coordnate names was given.')
+        self.coordcache[newcoordname.lower()] = (self.dataloc,self.sensorloc,self.coordnames,outcoords)
+        return outcoords
 
     def checkcoords(self,newcoords,coordname):
         """ This method checks to see if all of the coordiantes are in the class instance.
@@ -394,11 +487,8 @@ class GeoData(object):
         origcoordname = self.coordnames
         if coordname!=origcoordname:
             return False
-        for irow in newcoords:
-            pdb.set_trace()
-            if not sp.any(sp.all(origcoords==irow,axis=1)):
-                return False
-        return True
+        origset = set(map(tuple,origcoords.tolist()))
+        return all(tuple(irow) in origset for irow in newcoords.tolist())
 
     def datareducelocation(self,newcoords,coordname,key=None):
         """ This method takes a list of coordinates and finds what instances are in
@@ -413,12 +503,15 @@ class GeoData(object):
         if newcoords.ndim == 1:
             reorderlist=newcoords
         else:
-            reorderlist = sp.zeros(len(newcoords)).astype('int64')
-            for irown,irow in enumerate(newcoords):
-                reorderlist[irown]=sp.where(sp.all(self.dataloc==irow,axis=1))[0][0]
+            # Hash each location once instead of scanning dataloc for every row.
+            locdict = {}
+            for irown,irow in enumerate(self.dataloc.tolist()):
+                locdict.setdefault(tuple(irow),irown)
+            reorderlist = np.array([locdict[tuple(irow)] for irow in newcoords.tolist()],dtype='int64')
 
         if key is None:
             self.dataloc = self.dataloc[reorderlist]
+            self.coordcache.clear()
             if self.issatellite():
                 self.times[reorderlist]
             for ikey in self.datanames():
@@ -443,7 +536,17 @@ class GeoData(object):
         if rm_old:
             del self.data[dataname]
     def copy(self):
-        return GeoData(copyinst,[self])
+        return self._from_trusted(*copyinst(self))
+
+    @classmethod
+    def _from_trusted(cls,data,coordnames,dataloc,sensorloc,times):
+        """ This will create an instance from variables that have already been
+        through __init__, e.g. from another instance, so the type checks and
+        time sorting are skipped."""
+        gd = cls.__new__(cls)
+        (gd.data,gd.coordnames,gd.dataloc,gd.sensorloc,gd.times) = (data,coordnames,dataloc,sensorloc,times)
+        gd.coordcache = {}
+        return gd
 
 
 
@@ -455,33 +558,23 @@ class GeoData(object):
     def __eq__(self,self2):
         '''This is the == operator. '''
         # Check the data dictionary
-        datakeys = self.data.keys()
-        if set(datakeys) !=set(self2.data.keys()):
+        if not samekeys(self.data,self2.data):
             return False
 
-        for ikey in datakeys:
-            a = np.ma.array(self.data[ikey],mask=np.isnan(self.data[ikey]))
-            b = np.ma.array(self2.data[ikey],mask=np.isnan(self2.data[ikey]))
-            if not np.ma.allequal(a,b):
+        for ikey in self.data:
+            if not nan_equal(self.data[ikey],self2.data[ikey]):
                 return False
         # Look at the coordinate names
         if self.coordnames!=self2.coordnames:
             return False
         # Look at the data location
-#        pdb.set_trace()
-        a = np.ma.array(self.dataloc,mask=np.isnan(self.dataloc))
-        blah = np.ma.array(self2.dataloc,mask=np.isnan(self2.dataloc))
-        if not np.ma.allequal(a,blah):
+        if not nan_equal(self.dataloc,self2.dataloc):
             return False
         # Look at the sensor location
-        a = np.ma.array(self.sensorloc,mask=np.isnan(self.sensorloc))
-        blah = np.ma.array(self2.sensorloc,mask=np.isnan(self2.sensorloc))
-        if not np.ma.allequal(a,blah):
+        if not nan_equal(self.sensorloc,self2.sensorloc):
             return False
         # Look at the times
-        a = np.ma.array(self.times,mask=np.isnan(self.times))
-        blah = np.ma.array(self2.times,mask=np.isnan(self2.times))
-        if not np.ma.allequal(a,blah):
+        if not nan_equal(self.times,self2.times):
             return False
 
         return True
@@ -492,7 +585,25 @@ class GeoData(object):
         return not self.__eq__(self2)
 #%%
 def copyinst(obj1):
-    return(obj1.data.copy(),(obj1.coordnames+'.')[:-1],obj1.dataloc.copy(),obj1.sensorloc.copy(),obj1.times.copy())
+    # copy the arrays too so the new instance does not share data with obj1, keeping their memory layout
+    datacopy = {ikey:(ival.copy(order='K') if isinstance(ival,np.ndarray) else ival.copy())
+                for ikey,ival in obj1.data.items()}
+    return(datacopy,obj1.coordnames,obj1.dataloc.copy(),obj1.sensorloc.copy(),obj1.times.copy())
+
+def samekeys(dict1,dict2):
+    """ Checks if two dictionaries have the same keys without building sets of them."""
+    return len(dict1)==len(dict2) and all(ikey in dict2 for ikey in dict1)
+
+def nan_equal(a,b):
+    """ Checks if two arrays are equal where nans in the same place are treated as equal."""
+    a = np.asarray(a)
+    b = np.asarray(b)
+    if a.shape!=b.shape:
+        return False
+    if ne is not None and a.dtype.kind=='f' and b.dtype.kind=='f':
+        # numexpr does this in one threaded pass without the temporary nan masks
+        return bool(ne.evaluate('(a==b) | ((a!=a) & (b!=b))').all())
+    return bool(((a==b) | (np.isnan(a) & np.isnan(b))).all())
 
 def is_numeric(obj):
     return isinstance(obj,(integer_types,float))
@@ -517,6 +628,42 @@ def pathparts(path):
             return components
         components.append(tail)
 
+def h5_array(h5file,where,name,obj,filters,timeax=0):
+    """ This will write obj to the h5 file as a chunked and compressed array if it
+        is a numeric numpy array, otherwise it will be written as a plain array.
+        Inputs
+            h5file - The PyTables file object.
+            where - The group the array will be placed in.
+            name - The name of the array.
+            obj - The object that is being written.
+            filters - A tables.Filters instance for the compression.
+            timeax - (default - 0) The axis of obj that is time, see pick_chunks."""
+    if isinstance(obj,np.ndarray) and obj.ndim>0 and obj.size>0 and obj.dtype.kind in 'biufc':
+        chunkshape = pick_chunks(obj.shape,obj.dtype.itemsize,timeax)
+        return h5file.create_carray(where,name,obj=obj,chunkshape=chunkshape,filters=filters)
+    return h5file.create_array(where,name,obj)
+
+def pick_chunks(shape,itemsize,timeax=0,target_bytes=1<<20):
+    """ This will pick a chunk shape for an array that is around target_bytes in size.
+        The time axis is cut down first so a single time instance can be read from
+        as few chunks as possible, then the other axes in order.
+        Inputs
+            shape - The shape of the array.
+            itemsize - The number of bytes of each element.
+            timeax - (default - 0) The time axis, e.g. 1 for NlocxNt data and 0 for
+                NtxNyxNx images, satellite data, times and dataloc.
+            target_bytes - The desired size of a chunk in bytes.
+        Outputs
+            A tuple with the chunk shape."""
+    chunk = list(shape)
+    axorder = [timeax]+[iax for iax in range(len(shape)) if iax!=timeax]
+    for iax in axorder:
+        if itemsize*np.prod(chunk)<=target_bytes:
+            break
+        rest = itemsize*np.prod(chunk[:iax]+chunk[iax+1:])
+        chunk[iax] = int(max(1,min(chunk[iax],target_bytes//rest)))
+    return tuple(chunk)
+
 def timerepair(timear):
     if timear.ndim==2:
         if timear.shape[1] ==2:
@@ -527,10 +674,13 @@ def timerepair(timear):
         warn('Timear is only of size 1. Making second element that is 60 seconds ahead of the original')
         return  sp.array([[timear[0],timear[0]+60]])
 
-    avdiff = np.diff(timear).mean()
-    timear2 = np.roll(timear,-1)
-    timear2[-1]=timear2[-2]+avdiff
-    return np.column_stack((timear,timear2))
+    # The end of each time is the start of the next one, the last one uses the average step.
+    avdiff = (timear[-1]-timear[0])/(timear.size-1)
+    outtime = np.empty((timear.size,2),dtype=timear.dtype)
+    outtime[:,0] = timear
+    outtime[:-1,1] = timear[1:]
+    outtime[-1,1] = timear[-1]+avdiff
+    return outtime
 
 #%% Interpolation speed up code
 def interp_weights(xyz, uvw,d=3):
@@ -543,9 +693,61 @@ def interp_weights(xyz, uvw,d=3):
     bary = np.einsum('njk,nk->nj', temp[:, :d, :], delta)
     return vertices, np.hstack((bary, 1 - bary.sum(axis=1, keepdims=True)))
 
+# The points and weights from the last call to cached_interp_weights, under the
+# key 'last'. This holds copies of both sets of points so it can be large, use
+# clear_interp_cache() to free it.
+_WEIGHTCACHE = {}
+_WEIGHTLOCK = threading.Lock()
+
+def clear_interp_cache():
+    """ Frees the points and weights kept by cached_interp_weights."""
+    with _WEIGHTLOCK:
+        _WEIGHTCACHE.clear()
+
+def cached_interp_weights(xyz, uvw, d=3, cache=True):
+    """ This is the same as interp_weights but the weights for the last set of
+        points are kept. Interpolating a series of instances, e.g. radar frames,
+        onto the same grid will then only do the triangulation once. If cache
+        is False the cache is neither used nor changed."""
+    if not cache:
+        return interp_weights(xyz, uvw, d)
+    with _WEIGHTLOCK:
+        cached = _WEIGHTCACHE.get('last')
+    if cached is not None:
+        (oldxyz, olduvw, oldd, vtx, wts) = cached
+        if oldd==d and np.array_equal(oldxyz, xyz) and np.array_equal(olduvw, uvw):
+            return vtx, wts
+    vtx, wts = interp_weights(xyz, uvw, d)
+    with _WEIGHTLOCK:
+        _WEIGHTCACHE['last'] = (xyz.copy(), uvw.copy(), d, vtx, wts)
+    return vtx, wts
+
 def interpolate(values, vtx, wts, fill_value=np.nan):
-    ret = np.einsum('nj,nj->n', np.take(values, vtx), wts)
+    # values can be NxNt to interpolate every time at once
+    ret = np.einsum('nj...,nj->n...', np.take(values, vtx, axis=0), wts)
     ret[np.any(wts < 0, axis=1)] = fill_value
     return ret
 
+def grid_interpolator(xyz, uvw, method='nearest', fill_value=np.nan):
+    """ This will do the expensive part of spinterp.griddata, the triangulation
+        or the nearest neighbor search, once so it can be reused for many sets
+        of values on the same points.
+        Inputs
+            xyz - A NxD numpy array of the points the values are known at.
+            uvw - A MxD numpy array of the points to interpolate to.
+            method - A string, either 'linear', 'nearest' or 'cubic'.
+            fill_value - The value used for points outside of the convex hull.
+        Outputs
+            A function that takes a length N vector of values and returns the
+            length M vector of interpolated values."""
+    if method=='nearest':
+        nnind = cKDTree(xyz).query(uvw)[1]
+        return lambda values: np.asarray(values)[nnind]
+    tri = Delaunay(xyz)
+    if method=='linear':
+        return lambda values: spinterp.LinearNDInterpolator(tri, np.asarray(values), fill_value=fill_value)(uvw)
+    if method=='cubic':
+        return lambda values: spinterp.CloughTocher2DInterpolator(tri, np.asarray(values), fill_value=fill_value)(uvw)
+    raise ValueError('method needs to be linear, nearest, cubic')
+
 
@@ -35,7 +35,6 @@ from pytz import UTC
 from . import CoordTransforms as CT
 from . import Path
 
-USEPANDAS = True #20x speedup vs CPython
 VARNAMES = ['data','coordnames','dataloc','sensorloc','times']
 
 EPOCH = datetime(1970,1,1,0,0,0,tzinfo=UTC)
@@ -78,7 +77,6 @@ def readMad_hdf5 (filename, paramstr): #timelims=None
 
         for p in paramstr:
             if not p in D.dtype.names:
-                logging.warning('{} is not a valid parameter name.'.format(p))
                 continue
 
             filt_data[p] = D[p]
@@ -86,41 +84,29 @@ def readMad_hdf5 (filename, paramstr): #timelims=None
 #%% SELECT
     filt_data.dropna(axis=0,how='any',subset=['range','az','el'],inplace=True)
 
-    #create list of unique data location lists
-    dataloc = filt_data[['range','az','el']].drop_duplicates()
-    uniq_times = filt_data['ut1'].drop_duplicates().values
-
+    #create list of unique data location lists, in the order they are first seen,
+    #along with the row (location) and column (time) of every measurement
+    (uniqloc,firstind,row_idx) = np.unique(filt_data[['range','az','el']].values,axis=0,
+                                           return_index=True,return_inverse=True)
+    locorder = np.argsort(firstind)
+    dataloc = uniqloc[locorder]
+    locrank = np.empty_like(locorder)
+    locrank[locorder] = np.arange(locorder.size)
+    row_idx = locrank[row_idx.ravel()]
+    (uniq_times,col_idx) = np.unique(filt_data['ut1'].values,return_inverse=True)
 
     #initialize and fill data dictionary with parameter arrays
-    #notnan = filt_data.index
-    if not USEPANDAS:
-        all_loc=filt_data[['range','az','el']].values.tolist()
-        all_times = filt_data['ut1'].values.tolist()
-        dataloclist = dataloc.values.tolist()
-        uniq_timeslist = uniq_times = filt_data['ut1'].drop_duplicates().values.tolist()
-        maxcols = len(uniq_times);  maxrows = len(dataloc)
-
     data = {}
     for p in paramstr:
-        if USEPANDAS:
-        # example of doing via numpy
+        if p not in filt_data:
+            logging.error('{} is not a valid parameter name.'.format(p))
+            continue
         # filt_data has already been filtered for time and location with the isr parameter(s) riding along.
-         #Just reshape it!
-            #NOTE: take off the .values to pass the DataFrame
-            d1_in = filt_data[p].reshape((dataloc.shape[0], uniq_times.shape[0]), order='F')
-            data[p] = DataFrame(data=d1_in, columns=uniq_times).values
-        else:
-            #example with CPython
-            vec = filt_data[p].values #list of parameter pulled from all data
-            arr = np.empty([maxrows,maxcols]) #converting the tempdata list into array form
-
-            for t in range(vec.size):
-                #row
-                row = dataloclist.index(all_loc[t])
-                #column-time
-                col = uniq_timeslist.index(all_times[t])
-                arr[row][col] = vec[t]
-            data[p] = arr
+        # Scatter it into place with one fancy index assignment.
+        arr = np.empty((dataloc.shape[0], uniq_times.shape[0]),order='F')
+        arr.fill(np.nan)
+        arr[row_idx,col_idx] = filt_data[p].values
+        data[p] = arr
 
         #example of doing by MultiIndex
 #        data[p]= DataFrame(index=[dataloc['range'],dataloc['az'],dataloc['el']],
@@ -133,8 +119,7 @@ def readMad_hdf5 (filename, paramstr): #timelims=None
     #get the sensor location (lat, long, rng)
     sensorloc = np.array([lat,lon,sensor_alt], dtype=float) #they are bytes so we NEED float!
     coordnames = 'Spherical'
-    #NOTE temporarily passing dataloc as Numpy array till rest of program is updated to Pandas
-    return (data,coordnames,dataloc.values,sensorloc,uniq_times)
+    return (data,coordnames,dataloc,sensorloc,uniq_times)
 
 def readSRI_h5(fn,params,timelims = None):
     assert isinstance(params,(tuple,list))
@@ -152,48 +137,50 @@ def readSRI_h5(fn,params,timelims = None):
                 'Te':('/FittedParams/Fits',  (-1,1)),
                 'Ti':('/FittedParams/Errors',(-1,1))}
 
-    with h5py.File(str(h5fn),'r',libver='latest') as f:
+    # Open the file once with a larger chunk cache for the big FittedParams reads.
+    with h5py.File(str(h5fn),'r',libver='latest',rdcc_nbytes=16*1024*1024,rdcc_nslots=521) as f:
         # Get the times and time lims
-        times = f['/Time/UnixTime'].value
+        times = f['/Time/UnixTime'][()]
         # get the sensor location
-        sensorloc = np.array([f['/Site/Latitude'].value,
-                              f['/Site/Longitude'].value,
-                              f['/Site/Altitude'].value])
+        sensorloc = np.array([f['/Site/Latitude'][()],
+                              f['/Site/Longitude'][()],
+                              f['/Site/Altitude'][()]])
         # Get the locations of the data points
-        rng = f['/FittedParams/Range'].value / 1e3
+        rng = f['/FittedParams/Range'][()] / 1e3
         angles = f['/BeamCodes'][:,1:3]
 
-    nt = times.shape[0]
-    if timelims is not None:
-        times = times[(times[:,0]>= timelims[0]) & (times[:,1]<timelims[1]) ,:]
         nt = times.shape[0]
-# allaz, allel corresponds to rng.ravel()
-    allaz = np.tile(angles[:,0],rng.shape[1])
-    allel = np.tile(angles[:,1],rng.shape[1])
-
-    dataloc =np.vstack((rng.ravel(),allaz,allel)).T
-    # Read in the data
-    data = {}
-    with h5py.File(str(h5fn),'r',libver='latest') as f:
+        if timelims is not None:
+            times = times[(times[:,0]>= timelims[0]) & (times[:,1]<timelims[1]) ,:]
+            nt = times.shape[0]
+        # allaz, allel corresponds to rng.ravel()
+        allaz = np.tile(angles[:,0],rng.shape[1])
+        allel = np.tile(angles[:,1],rng.shape[1])
+
+        dataloc =np.vstack((rng.ravel(),allaz,allel)).T
+        # remove nans from SRI file
+        nanlog = sp.any(sp.isnan(dataloc),1)
+        keeplog = sp.logical_not(nanlog)
+        dataloc = dataloc[keeplog]
+        # Read in the data
+        data = {}
         for istr in params:
             if not istr in pathdict.keys(): #list() NOT needed
                 logging.error('{} is not a valid parameter name.'.format(istr))
                 continue
             curpath = pathdict[istr][0]
             curint = pathdict[istr][-1]
-
+            dset = f[curpath]
+            # read straight into a buffer instead of making a temporary array
+            tempdata = np.empty((nt,)+dset.shape[1:3],dtype=dset.dtype)
             if curint is None: #3-D data
-                tempdata = f[curpath]
+                dset.read_direct(tempdata,np.s_[:nt])
             else: #5-D data -> 3-D data
-                tempdata = f[curpath][:,:,:,curint[0],curint[1]]
-            data[istr] = np.array([tempdata[iT,:,:].ravel() for iT in range(nt)]).T
-
-    # remove nans from SRI file
-    nanlog = sp.any(sp.isnan(dataloc),1)
-    keeplog = sp.logical_not(nanlog)
-    dataloc = dataloc[keeplog]
-    for ikey in data.keys():
-        data[ikey]= data[ikey][keeplog]
+                dset.read_direct(tempdata,np.s_[:nt,:,:,curint[0],curint[1]])
+            # Dropping the nan locations makes the only copy, the transpose of
+            # that is already column-major so asfortranarray does not copy again.
+            data[istr] = np.asfortranarray(tempdata.reshape(nt,-1)[:,keeplog].T)
+
     return (data,coordnames,dataloc,sensorloc,times)
 
 def read_h5_main(filename):
@@ -203,13 +190,20 @@ def read_h5_main(filename):
     because the index order of dicts is not deterministic.
     '''
     h5fn = Path(filename).expanduser()
-    with tb.openFile(str(h5fn)) as f:
+    # Use a larger chunk cache so the chunked arrays from write_h5 are read in fewer passes.
+    with tb.openFile(str(h5fn),CHUNK_CACHE_SIZE=16*1024*1024) as f:
         output={}
         # Read in all of the info from the h5 file and put it in a dictionary.
         for group in f.walkGroups(posixpath.sep):
             output[group._v_pathname]={}
             for array in f.listNodes(group, classname = 'Array'):
-                output[group._v_pathname][array.name]=array.read()
+                if array.flavor=='numpy' and array.ndim>0 and array.dtype.kind in 'biufc':
+                    # read straight into a preallocated array
+                    buf = np.empty(array.shape,dtype=array.dtype)
+                    array.read(out=buf)
+                else:
+                    buf = array.read()
+                output[group._v_pathname][array.name]=buf
 
     # find the base paOMTIdata.h5ths which could be dictionaries or the base directory
 #    outarr = [pathparts(ipath) for ipath in output.keys() if len(pathparts(ipath))>0]
@@ -251,11 +245,11 @@ def readOMTI(filename, paramstr):
     """
     h5fn = Path(filename).expanduser()
     with h5py.File(str(h5fn),'r',libver='latest') as f:
-        optical = {'optical':f['data/optical'].value} #for legacy API compatibility
-        dataloc = CT.enu2cartisian(f['dataloc'].value)
+        optical = {'optical':f['data/optical'][()]} #for legacy API compatibility
+        dataloc = CT.enu2cartisian(f['dataloc'][()])
         coordnames = 'Cartesian'
-        sensorloc = f['sensorloc'].value.squeeze()
-        times = f['times'].value
+        sensorloc = f['sensorloc'][()].squeeze()
+        times = f['times'][()]
 
     return optical, coordnames, dataloc, sensorloc, times
 
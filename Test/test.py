@@ -3,8 +3,13 @@
 self-test for GeoDataPython
 """
 from os.path import dirname,join
-from numpy.testing import assert_allclose,run_module_suite
+from shutil import rmtree
+from tempfile import mkdtemp
+import numpy as np
+from scipy.interpolate import griddata
+from numpy.testing import assert_allclose,assert_array_equal,run_module_suite
 #
+from GeoData.GeoData import GeoData
 from load_isropt import load_risromti
 
 path=dirname(__file__)
@@ -18,5 +23,75 @@ def test_risr():
     assert_allclose(omti.data['optical'][[32,41],[22,39]],
                     [ 603.03568232,  611.20040632])
 
+def makegd(times,nloc=4):
+    """ Make a small ground based GeoData instance where each data value is
+        its location index plus 10 times its start time."""
+    times = np.asarray(times,dtype=float)
+    data = {'ne':np.arange(nloc)[:,np.newaxis]+10*times[np.newaxis,:,0]}
+    dataloc = np.column_stack((np.arange(nloc,dtype=float),np.zeros(nloc),np.zeros(nloc)))
+    return GeoData('',(data,'Cartesian',dataloc,np.zeros(3),times))
+
+def test_interpolate():
+    rs = np.random.RandomState(0)
+    (nloc,nt) = (200,4)
+    dataloc = 10*rs.rand(nloc,3)
+    newcoords = 2+6*rs.rand(30,3)
+    times = np.column_stack((np.arange(nt),np.arange(1,nt+1)))
+    for method in ('nearest','linear'):
+        data = {'ne':rs.rand(nloc,nt),'ti':rs.rand(nloc,nt),'te':rs.rand(nloc,nt)}
+        data['ti'][rs.rand(nloc,nt)<0.1] = np.nan # changes with time
+        data['te'][:20] = np.nan # same at every time
+        orig = {k:v.copy() for k,v in data.items()}
+        gd = GeoData('',(data,'Cartesian',dataloc.copy(),np.zeros(3),times))
+        gd.interpolate(newcoords,'Cartesian',method=method)
+        for ikey,ival in orig.items():
+            for itime in range(nt):
+                curparam = ival[:,itime]
+                # the linear method does not drop the nans before interpolating
+                keep = np.isfinite(curparam) if method=='nearest' else np.ones(nloc,dtype=bool)
+                expected = griddata(dataloc[keep],curparam[keep],newcoords,method)
+                assert_allclose(gd.data[ikey][:,itime],expected,err_msg='{} {} {}'.format(method,ikey,itime))
+        assert_array_equal(gd.dataloc,newcoords)
+
+def test_h5_roundtrip():
+    gd = makegd([[0,1],[1,2],[2,3]],nloc=50)
+    gd.data['ne'][3,1] = np.nan
+    h5fn = join(mkdtemp(),'roundtrip.h5')
+    try:
+        gd.write_h5(h5fn)
+        gd2 = GeoData.read_h5(h5fn)
+    finally:
+        rmtree(dirname(h5fn))
+    assert_allclose(gd2.data['ne'],gd.data['ne'])
+    assert_array_equal(gd2.times,gd.times)
+    assert_array_equal(gd2.dataloc,gd.dataloc)
+    assert_array_equal(gd2.sensorloc,gd.sensorloc)
+
+def test_add_times():
+    gd = makegd([[0,1],[2,3],[4,5]])
+    gd.add_times(makegd([[1,2],[3,4]]))
+    assert_array_equal(gd.times[:,0],[0,1,2,3,4])
+    assert_array_equal(gd.data['ne'],np.arange(4)[:,np.newaxis]+10*np.arange(5.)[np.newaxis,:])
+
+def test_time2ind_repeated():
+    gd = makegd([[0,1],[0,1],[1,2],[1,2],[2,3]])
+    assert_array_equal(gd.time2ind([1.]),[2,3])
+    assert_array_equal(gd.time2ind([2.,0.,5.]),[0,1,4])
+    assert_array_equal(gd.timeslice([1.],'Time').times,[[1,2],[1,2]])
+    # large query with repeated times
+    gd = makegd(np.column_stack((np.repeat(np.arange(50000.),2),np.repeat(np.arange(1.,50001.),2))),nloc=1)
+    assert_array_equal(gd.time2ind(np.arange(0.,50000.,2)),np.flatnonzero(gd.times[:,0]%2==0))
+    # large query with unique times
+    gd = makegd(np.column_stack((np.arange(100000.),np.arange(1.,100001.))),nloc=1)
+    assert_array_equal(gd.time2ind(np.arange(-1.,100000.,3)),np.arange(2,100000,3))
+
+def test_copy():
+    gd = makegd([[0,1],[1,2]])
+    gd2 = gd.copy()
+    assert gd2==gd
+    gd2.data['ne'][0,0] = -1.
+    assert gd.data['ne'][0,0]==0.
+    assert gd2!=gd
+
 if __name__ == '__main__':
     run_module_suite()